@@ -0,0 +1,115 @@
+"""
+Synthetic data files of representative shapes, every generator writes
+a file into the directory and returns its path and the number of records.
+"""
+import csv
+import json
+from pathlib import Path
+import random
+
+
+def wide_flat(directory, scale=1.0, seed=0):
+    """json list of flat records with a lot of fields"""
+    rnd = random.Random(seed)
+    fields = [f'field_{n}' for n in range(200)]
+    records = [
+        {k: _primitive(rnd) for k in fields}
+        for _ in range(int(1000 * scale))
+    ]
+    return _write_json(directory, 'wide_flat.json', records), len(records)
+
+
+def deep_nesting(directory, scale=1.0, seed=0):
+    """json list of records nested 30 levels deep"""
+    rnd = random.Random(seed)
+    records = []
+    for _ in range(int(500 * scale)):
+        node = {'leaf': _primitive(rnd)}
+        for depth in range(30):
+            node = {f'level_{depth}': node, 'value': _primitive(rnd), 'items': [_primitive(rnd)]}
+        records.append(node)
+    return _write_json(directory, 'deep_nesting.json', records), len(records)
+
+
+def id_keyed_maps(directory, scale=1.0, seed=0):
+    """json map-shaped dicts: records keyed by ids instead of being a list"""
+    rnd = random.Random(seed)
+    records = {
+        f'{rnd.getrandbits(64):016x}': {
+            'name': _word(rnd),
+            'tags': {f'tag-{rnd.randrange(10000)}': _primitive(rnd) for _ in range(5)},
+        }
+        for _ in range(int(20000 * scale))
+    }
+    return _write_json(directory, 'id_keyed_maps.json', {'by_id': records}), len(records)
+
+
+def long_arrays(directory, scale=1.0, seed=0):
+    """json records holding long arrays of primitives and small dicts"""
+    rnd = random.Random(seed)
+    records = [
+        {
+            'values': [_primitive(rnd) for _ in range(10000)],
+            'points': [{'x': rnd.random(), 'y': rnd.random()} for _ in range(2000)],
+        }
+        for _ in range(int(20 * scale))
+    ]
+    return _write_json(directory, 'long_arrays.json', records), len(records)
+
+
+def xml_attributes(directory, scale=1.0, seed=0):
+    """xml with attribute-heavy repeated elements"""
+    rnd = random.Random(seed)
+    path = Path(directory, 'xml_attributes.xml')
+    count = int(20000 * scale)
+    with path.open('w', encoding='utf8') as fh:
+        fh.write('<?xml version="1.0" encoding="utf-8"?>\n<catalog version="1">\n')
+        for n in range(count):
+            fh.write(
+                f'<item id="{n}" kind="{_word(rnd)}" price="{rnd.random() * 100:.2f}">'
+                f'<name lang="en">{_word(rnd)} {_word(rnd)}</name>'
+                f'<description>{" ".join(_word(rnd) for _ in range(rnd.randrange(20)))}</description>'
+                + ''.join(f'<tag weight="{rnd.randrange(10)}">{_word(rnd)}</tag>'
+                          for _ in range(rnd.randrange(1, 5)))
+                + '</item>\n'
+            )
+        fh.write('</catalog>\n')
+    return path, count
+
+
+def wide_csv(directory, scale=1.0, seed=0):
+    """csv with a lot of columns"""
+    rnd = random.Random(seed)
+    path = Path(directory, 'wide_csv.csv')
+    count = int(5000 * scale)
+    columns = [f'col_{n}' for n in range(300)]
+    with path.open('w', encoding='utf8', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(columns)
+        for _ in range(count):
+            writer.writerow([_word(rnd) if rnd.random() < 0.5 else rnd.randrange(10**6)
+                             for _ in columns])
+    return path, count
+
+
+GENERATORS = {
+    func.__name__: func
+    for func in [wide_flat, deep_nesting, id_keyed_maps, long_arrays, xml_attributes, wide_csv]
+}
+
+
+def _write_json(directory, name, struct):
+    path = Path(directory, name)
+    with path.open('w', encoding='utf8') as fh:
+        json.dump(struct, fh)
+    return path
+
+
+def _primitive(rnd):
+    return rnd.choice([
+        None, 0, rnd.randrange(10**9), rnd.random(), True, '', _word(rnd),
+    ])
+
+
+def _word(rnd):
+    return ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randrange(1, 12)))
@@ -0,0 +1,105 @@
+"""
+Import time / cli startup benchmark, e.g.:
+
+    python -m benchmarks.import_time --output before.json
+    ...
+    python -m benchmarks.import_time --output after.json --compare before.json
+
+Fails if format-specific or optional dependencies get imported eagerly.
+"""
+import json
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import time
+
+import click
+
+from benchmarks.run import REPO_DIR, _git_commit, _print_comparison
+
+
+# must not be imported until a file of the corresponding format is read
+LAZY_MODULES = ['numpy', 'xmltodict', 'xmlschema', 'elementpath']
+
+STARTUPS = {
+    'interpreter': 'pass',
+    'import_package': 'import collection_stats',
+    'import_cli': 'import collection_stats.entrypoint',
+    'cli_help': (
+        'import sys; sys.argv = ["collection-stats", "--help"];'
+        ' from collection_stats.entrypoint import main; main()'
+    ),
+}
+
+
+@click.command()
+@click.option('--repeat', type=click.IntRange(min=1), default=20,
+              help="start the interpreter this many times and keep the best timing")
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help="write json results to this file instead of stdout")
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), default=None,
+              help="json results of a previous run to compare timings against")
+@click.option('--max-regression', type=float, default=None,
+              help="exit with an error if any startup got slower than this many percent"
+                   " (used only with --compare)")
+def main(repeat, output, compare, max_regression):
+    """
+    Benchmark interpreter startup with collection_stats imports and check lazy imports.
+    """
+    stages = {}
+    for name, code in STARTUPS.items():
+        seconds = min(_run_python(code) for _ in range(repeat))
+        stages[name] = {'seconds': seconds}
+        print(f"  {name:<16} {seconds * 1000:>9.1f} ms", file=sys.stderr)
+
+    eagerly_imported = json.loads(_run_python(
+        'import json, sys; import collection_stats.entrypoint;'
+        f' print(json.dumps([i for i in {LAZY_MODULES!r} if i in sys.modules]))',
+        output=True,
+    ))
+
+    results = {
+        'python': platform.python_version(),
+        'commit': _git_commit(),
+        'scale': None,
+        'cases': {
+            'startup': {'stages': stages, 'eagerly_imported': eagerly_imported},
+        },
+    }
+
+    report = json.dumps(results, indent=2)
+    if output:
+        Path(output).write_text(report + '\n', encoding='utf8')
+        print(f"written '{output}'", file=sys.stderr)
+    else:
+        print(report)
+
+    failed = False
+    if eagerly_imported:
+        print(f"imported eagerly: {', '.join(eagerly_imported)}", file=sys.stderr)
+        failed = True
+    if compare:
+        baseline = json.loads(Path(compare).read_text(encoding='utf8'))
+        worst = _print_comparison(baseline, results)
+        if max_regression is not None and worst > max_regression:
+            print(f"regression {worst:.1f}% exceeds {max_regression}%", file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+def _run_python(code, output=False):
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=REPO_DIR,
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    return process.stdout if output else elapsed
+
+
+if __name__ == '__main__':
+    main()
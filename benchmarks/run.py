@@ -0,0 +1,213 @@
+"""
+Benchmarks of collection_stats stages on synthetic data, e.g.:
+
+    python -m benchmarks.run --output before.json
+    ...
+    python -m benchmarks.run --output after.json --compare before.json
+
+Every case runs in a separate process, so that peak RSS is measured per case.
+"""
+import contextlib
+import copy
+import io
+import json
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+from benchmarks.generators import GENERATORS
+from collection_stats.profiling import peak_rss_mb
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+@click.command()
+@click.option('--case', 'cases', multiple=True, type=click.Choice(list(GENERATORS)),
+              help="case to run (repeatable), defaults to all cases")
+@click.option('--scale', type=float, default=1.0, help="multiplier of generated data size")
+@click.option('--repeat', type=click.IntRange(min=1), default=3,
+              help="run every stage this many times and keep the best timing")
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help="write json results to this file instead of stdout")
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), default=None,
+              help="json results of a previous run to compare timings against")
+@click.option('--max-regression', type=float, default=None,
+              help="exit with an error if any stage got slower than this many percent"
+                   " (used only with --compare)")
+@click.option('--in-process', is_flag=True, hidden=True)
+def main(cases, scale, repeat, output, compare, max_regression, in_process):
+    """
+    Benchmark reading, collecting, rendering, plunking and sampling synthetic files.
+    """
+    cases = cases or list(GENERATORS)
+
+    if in_process:
+        results = {name: run_case(name, scale=scale, repeat=repeat) for name in cases}
+        print(json.dumps(results))
+        return
+
+    results = {
+        'python': platform.python_version(),
+        'commit': _git_commit(),
+        'scale': scale,
+        'cases': {},
+    }
+    for name in cases:
+        print(f"running {name}...", file=sys.stderr)
+        results['cases'].update(_run_case_process(name, scale=scale, repeat=repeat))
+
+    _print_results(results)
+
+    report = json.dumps(results, indent=2)
+    if output:
+        Path(output).write_text(report + '\n', encoding='utf8')
+        print(f"written '{output}'", file=sys.stderr)
+    else:
+        print(report)
+
+    if compare:
+        baseline = json.loads(Path(compare).read_text(encoding='utf8'))
+        worst = _print_comparison(baseline, results)
+        if max_regression is not None and worst > max_regression:
+            print(f"regression {worst:.1f}% exceeds {max_regression}%", file=sys.stderr)
+            sys.exit(1)
+
+
+def run_case(name, *, scale=1.0, repeat=3):
+    from collection_stats import CollectionStatsCollector
+    from collection_stats.collection_stats_collector import utils
+    from collection_stats.pipeline import Pipeline
+
+    readers = {
+        '.json': utils.read_json,
+        '.xml': utils.read_xml,
+        '.csv': utils.read_csv,
+    }
+    stages = {}
+
+    def timed(stage, func, setup=lambda: None):
+        best = None
+        for _ in range(repeat):
+            arg = setup()
+            start = time.perf_counter()
+            result = func(arg)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        stages[stage] = best
+        return result
+
+    def collect(struct, **kwargs):
+        collector = CollectionStatsCollector(**kwargs)
+        collector.add(struct)
+        return collector
+
+    def collect_records(records):
+        collector = CollectionStatsCollector()
+        for record in records:
+            collector.add(record)
+        return collector
+
+    with tempfile.TemporaryDirectory() as directory:
+        path, records_count = GENERATORS[name](directory, scale=scale)
+        file_size = path.stat().st_size
+        reader = readers[path.suffix]
+
+        dct = timed('read', lambda _: reader(path))
+        collector = timed('collect', lambda _: collect(dct))
+        records = list(utils.split_records(dct))
+        # a file which isn't split (a map keyed by ids, csv columns) would just repeat 'collect'
+        if len(records) > 1:
+            timed('merge', collect_records, setup=lambda: records)
+        timed('render', lambda _: str(collector))
+        timed('pipeline', lambda _: Pipeline(CollectionStatsCollector()).run([path]))
+        timed('plunk', lambda _: collect(dct, plunk=True))
+        timed('plunk_in_place', utils.plunk, setup=lambda: copy.deepcopy(dct))
+        samples_dirs = iter(range(repeat))
+        with contextlib.redirect_stderr(io.StringIO()):
+            timed('samples', lambda samples_dir: utils.SamplesWriter(
+                samples_dir, is_xml_like=path.suffix == '.xml').write(dct),
+                setup=lambda: Path(directory, f'samples_{next(samples_dirs)}'))
+
+    return {
+        'file_mb': file_size / 2**20,
+        'records': records_count,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': {
+            stage: {
+                'seconds': seconds,
+                'records_per_s': records_count / seconds if seconds else None,
+                'mb_per_s': file_size / 2**20 / seconds if seconds else None,
+            }
+            for stage, seconds in stages.items()
+        },
+    }
+
+
+def _run_case_process(name, *, scale, repeat):
+    process = subprocess.run(
+        [
+            sys.executable, '-m', 'benchmarks.run', '--in-process',
+            '--case', name, '--scale', str(scale), '--repeat', str(repeat),
+        ],
+        cwd=REPO_DIR,
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return json.loads(process.stdout)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=REPO_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results):
+    for name, case in results['cases'].items():
+        print(f"\n{name}: {case['file_mb']:.1f} MB, {case['records']} records,"
+              f" peak rss {_format(case['peak_rss_mb'], '.0f')} MB", file=sys.stderr)
+        for stage, timing in case['stages'].items():
+            print(f"  {stage:<16} {timing['seconds']:>9.3f} s"
+                  f" {_format(timing['records_per_s'], '.0f'):>12} rec/s"
+                  f" {_format(timing['mb_per_s'], '.2f'):>9} MB/s", file=sys.stderr)
+
+
+def _format(value, spec):
+    """formats a measurement which may be missing (None)"""
+    return format(value, spec) if value is not None else '?'
+
+
+def _print_comparison(baseline, results):
+    """:return: the worst slowdown in percent"""
+    worst = 0.0
+    print(f"\ncompared to {baseline.get('commit')}:", file=sys.stderr)
+    if baseline.get('scale') != results['scale']:
+        print(f"  warning: scale {baseline.get('scale')} differs from {results['scale']}",
+              file=sys.stderr)
+    for name, case in results['cases'].items():
+        old_case = baseline['cases'].get(name)
+        if old_case is None:
+            continue
+        for stage, timing in case['stages'].items():
+            old_timing = old_case['stages'].get(stage)
+            if not old_timing or not old_timing['seconds']:
+                continue
+            change = (timing['seconds'] / old_timing['seconds'] - 1) * 100
+            worst = max(worst, change)
+            print(f"  {name:<16} {stage:<16} {old_timing['seconds']:>9.3f} s"
+                  f" -> {timing['seconds']:>9.3f} s {change:>+7.1f}%", file=sys.stderr)
+    return worst
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,5 @@
-from .collection_stats_collector import CollectionStatsCollector
+from .collection_stats_collector import (
+    CollectionStatsCollector,
+    StreamedCollectionStats,
+    collection_stats,
+)
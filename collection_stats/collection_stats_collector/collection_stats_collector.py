@@ -2,13 +2,7 @@ import abc
 import itertools
 import math
 import collections
-from .utils import Compact
-try:
-    import numpy as np
-    std_func = np.std
-except ImportError:
-    import statistics
-    std_func = statistics.pstdev
+from .utils import Compact, with_values
 
 
 class _NoName:
@@ -28,31 +22,173 @@ class CollectionStatsCollector:
     print(collector.count)
     print(collector)
     print(collector.format(include_samples=True))
+
+    Schema discovery (only the structure is of interest, not exact counts):
+
+    collector = CollectionStatsCollector(stable_after=1000)
+
+    for collection in some_collections:
+        collector.add(collection)
+        if collector.is_stable:
+            break
+
+    print(collector.format(structure_only=True))
+
+    Collections of different root types (e.g. a json list and an xml document) can't be
+    merged, they are reported separately, one after another.
     """
 
-    def __init__(self):
-        self._stats = None
+    EMPTY = 'no collections added'
+
+    def __init__(self, stable_after=None, plunk=False):
+        """
+        :param stable_after:  consider the structure stable (see is_stable) once this many
+                              consecutively added collections introduced no new paths
+        :param plunk:  don't count empty values (null, 0, "", [], {} etc),
+                       the added collections are left intact
+        """
+        self._stats = {}  # root node type -> stats
+        self._plunk = plunk
+        self._stable_after = stable_after
+        self._unchanged_count = 0
 
     def add(self, collection, uid=None):
-        stats = collection_stats(collection, uid=uid)
-        if self._stats is not None:
-            self._stats += stats
+        self.add_stats(collection_stats(collection, uid=uid, plunk=self._plunk))
+
+    def add_stats(self, stats):
+        """
+        :param stats:  stats of a collection, as returned by collection_stats()
+                       (e.g. a snapshot pickled earlier), it is merged into, not copied
+        """
+        root_stats = self._stats.get(stats._node_type)
+        if root_stats is not None:
+            new_paths = root_stats._merge(stats)
         else:
-            self._stats = stats
+            self._stats[stats._node_type] = stats
+            new_paths = 1
+        if new_paths:
+            self._unchanged_count = 0
+        else:
+            self._unchanged_count += 1
 
     @property
     def count(self):
-        return self._stats.count
+        return sum(i.count for i in self._stats.values())
 
-    def format(self, include_samples=True):
-        return self._stats.format(include_samples=include_samples)
+    @property
+    def is_stable(self):
+        return self._stable_after is not None and self._unchanged_count >= self._stable_after
+
+    def format(self, include_samples=True, structure_only=False):
+        if not self._stats:
+            return self.EMPTY
+        return '\n'.join(
+            i.format(include_samples=include_samples, structure_only=structure_only)
+            for i in self._stats.values()
+        )
 
     def __str__(self):
-        return str(self._stats)
+        if not self._stats:
+            return self.EMPTY
+        return '\n'.join(str(i) for i in self._stats.values())
+
+
+class StreamedCollectionStats:
+    """
+    Stats of a collection parsed in parts, equal to collection_stats() of the whole
+    collection. Values of mapping keys are added one by one (e.g. rows of csv columns,
+    repeated xml elements) and the rest of the collection is passed at the end.
+
+    Usage:
+
+    streamed = StreamedCollectionStats(single_as_value=True)
+    streamed.add(['root'], 'item', item_1)
+    streamed.add(['root'], 'item', item_2)
+    stats = streamed.build({'root': {'@id': '1'}})
 
+    # the same as collection_stats({'root': {'@id': '1', 'item': [item_1, item_2]}})
+    collector.add_stats(stats)
+
+    Items of a collection which is a list itself are added with an empty path and key None.
+    """
 
-def collection_stats(node, uid=None, _name=_NoName):
-    args, kwargs = (node, ), dict(name=_name, uid=uid)
+    def __init__(self, uid=None, plunk=False, single_as_value=False):
+        """
+        :param single_as_value:  a key added a single value to maps to the value itself,
+                                 not to a list of it (like xml elements parsed by xmltodict)
+        """
+        self._uid = uid
+        self._plunk = plunk
+        self._single_as_value = single_as_value
+        self._singles = {}  # (path, key) -> value
+        self._lists = {}  # (path, key) -> _StreamedList
+
+    def add(self, path, key, value):
+        """
+        :param path:  keys of the mapping the key belongs to
+        :param key:
+        :param value:
+        """
+        path_key = (tuple(path), key)
+        values = self._lists.get(path_key)
+        if values is None:
+            if self._single_as_value and path_key not in self._singles:
+                self._singles[path_key] = value
+                return
+            name = _NoName if path_key == ((), None) else key
+            values = self._lists[path_key] = _StreamedList(name, uid=self._uid, plunk=self._plunk)
+            if path_key in self._singles:
+                values.add(self._singles.pop(path_key))
+        values.add(value)
+
+    def build(self, collection):
+        """
+        :param collection:  without the added values (mappings leading to them may be missing),
+                            it is not modified
+        :return:  stats of the whole collection, added values are reset
+        """
+        root = self._lists.get(((), None))
+        if root is not None:
+            root.stats._reset_size(root.size)
+            self._singles, self._lists = {}, {}
+            return root.stats
+        for (path, key), value in self._singles.items():
+            collection = with_values(collection, path, {key: value})
+        for path, key in self._lists:
+            # a placeholder of the list, its stats are replaced below
+            collection = with_values(collection, path, {key: [None]})
+        stats = collection_stats(collection, uid=self._uid, plunk=self._plunk)
+        for (path, key), values in self._lists.items():
+            parent = stats
+            for name in path:
+                parent = parent._children_nodes[(dict, name)]
+            values.stats._reset_size(values.size)
+            parent._children_nodes[(list, key)] = values.stats
+        self._singles, self._lists = {}, {}
+        return stats
+
+
+class _StreamedList:
+    """stats of a list whose items are added one by one"""
+
+    def __init__(self, name, uid=None, plunk=False):
+        self.stats = IterableNodeStats([], name=name, uid=uid, plunk=plunk)
+        self.size = 0
+        self._plunk = plunk
+
+    def add(self, value):
+        self.stats._add_child_node(value)
+        if value or not self._plunk:
+            self.size += 1
+
+
+def _node_type(node):
+    """dict subclasses (OrderedDict of xml etc) are merged with plain dicts"""
+    return dict if isinstance(node, dict) else type(node)
+
+
+def collection_stats(node, uid=None, plunk=False, _name=_NoName):
+    args, kwargs = (node, ), dict(name=_name, uid=uid, plunk=plunk)
     if isinstance(node, (dict, )):
         return MappingNodeStats(*args, **kwargs)
     elif isinstance(node, (list, set, tuple, )):
@@ -66,12 +202,15 @@ class CollectionStats(metaclass=abc.ABCMeta):
     MAX_RUN_SIZES = 1000
     MAX_SIZES = 10
 
-    def __init__(self, node, name=_NoName, uid=None):
-        self._node = node
+    def __init__(self, node, name=_NoName, uid=None, plunk=False):
+        # the node itself is not kept, so that stats don't hold the whole collection
+        self._node_type = _node_type(node)
         self._name = name
         self._type_name = type(node).__name__\
             .replace('OrderedDict', 'dict').replace('NoneType', 'None').replace('Decimal', 'decimal')
         self._uid = uid
+        self._plunk = plunk
+        self._size = self._node_size(node)
 
         self._count = 1
         self._min = self._size
@@ -89,7 +228,7 @@ class CollectionStats(metaclass=abc.ABCMeta):
         self._populate_samples()
 
         self._children_nodes = {}
-        self._populate_children_nodes()
+        self._populate_children_nodes(node)
 
     @property
     def count(self):
@@ -117,34 +256,49 @@ class CollectionStats(metaclass=abc.ABCMeta):
                 self._max_samples = {self._uid: self._size}
 
     @abc.abstractmethod
-    def _populate_children_nodes(self): pass
+    def _populate_children_nodes(self, node): pass
 
     def _add_child_node(self, node, name=_NoName):
+        if self._plunk and not node:
+            return
         child_node = collection_stats(
-            node, uid=self._uid, _name=name,
+            node, uid=self._uid, plunk=self._plunk, _name=name,
         )
-        key = (type(node), name)
+        key = (_node_type(node), name)
         if key not in self._children_nodes:
             self._children_nodes[key] = child_node
         else:
             self._children_nodes[key] += child_node
 
-    @property
-    def _size(self):
-        if isinstance(self._node, (int, float)):
-            return self._node
-        elif isinstance(self._node, (dict, list, set, str)):
-            return len(self._node)
+    def _reset_size(self, size):
+        """sets the size of a node whose children were added one by one"""
+        self._size = self._min = self._avg = self._max = size
+        self._size_counter = collections.Counter({size: 1})
+        self._populate_samples()
+
+    def _node_size(self, node):
+        if isinstance(node, (int, float)):
+            return node
+        elif isinstance(node, (dict, list, set)) and self._plunk:
+            values = node.values() if isinstance(node, dict) else node
+            return sum(1 for i in values if i)
+        elif isinstance(node, (dict, list, set, str)):
+            return len(node)
         else:
             return None
 
     def __str__(self):
         return self._as_str()
 
-    def format(self, include_samples=True, include_sizes=True):
-        return self._as_str(include_samples=include_samples, include_sizes=include_sizes)
+    def format(self, include_samples=True, include_sizes=True, structure_only=False):
+        return self._as_str(
+            include_samples=include_samples,
+            include_sizes=include_sizes,
+            structure_only=structure_only,
+        )
 
-    def _as_str(self, indentation='', last_child=False, include_samples=True, include_sizes=True):
+    def _as_str(self, indentation='', last_child=False, include_samples=True, include_sizes=True,
+                structure_only=False):
         """1 dict avg3.0 min3 max3 std0 type[1] min[1] max[1]"""
         mapping_value_overindent = 2
         own_str_parts = []
@@ -159,8 +313,11 @@ class CollectionStats(metaclass=abc.ABCMeta):
         else:
             indentation += ' ' * mapping_value_overindent
             count_indentation = indentation
-        own_str_parts.append(f'{count_indentation}{self._count} {self._type_name}')
-        if self._is_countable:
+        if structure_only:
+            own_str_parts.append(f'{count_indentation}{self._type_name}')
+        else:
+            own_str_parts.append(f'{count_indentation}{self._count} {self._type_name}')
+        if self._is_countable and not structure_only:
             mn = self._min if not isinstance(self._min, bool) else int(self._min)
             mx = self._max if not isinstance(self._max, bool) else int(self._max)
             str_part = f'{Compact.float(self._avg)} '
@@ -185,7 +342,7 @@ class CollectionStats(metaclass=abc.ABCMeta):
                 sizes = dict(self._size_counter.most_common(self.MAX_SIZES))
                 str_part += f'{sizes}'
                 own_str_parts.append(str_part)
-        if self._type_samples and include_samples:
+        if self._type_samples and include_samples and not structure_only:
             own_str_parts.append('uids:')
             own_str_parts.append(f'type{sorted(self._type_samples)}')
             if self._is_countable:
@@ -205,7 +362,9 @@ class CollectionStats(metaclass=abc.ABCMeta):
                 node._as_str(
                     indentation=child_indentation,
                     last_child=i+1 == children_count,
-                    include_samples=include_samples
+                    include_samples=include_samples,
+                    include_sizes=include_sizes,
+                    structure_only=structure_only,
                 )
             )
         return '\n'.join(itertools.chain(parts, children_str_parts))
@@ -226,7 +385,16 @@ class CollectionStats(metaclass=abc.ABCMeta):
         )
 
     def __add__(self, other):
-        if type(self._node) is not type(other._node):
+        self._merge(other)
+        return self
+
+    def _merge(self, other):
+        """
+        Merges other stats into self.
+
+        :return:  the number of nodes (paths) which other has and self had not
+        """
+        if self._node_type is not other._node_type:
             raise NotImplementedError()
         if self._size is not None:
             self._add_samples(other)
@@ -247,15 +415,18 @@ class CollectionStats(metaclass=abc.ABCMeta):
             elif self._count > 1 and other._count > 1:
                 self._std = math.sqrt((self._std ** 2 + other._std ** 2) / 2)
             else:
-                self._std = std_func([self._size, other._size])
+                # population std of two values
+                self._std = abs(self._size - other._size) / 2
 
         self._count += other._count
+        new_paths = 0
         for k, v in other._children_nodes.items():
             if k in self._children_nodes:
-                self._children_nodes[k] += v
+                new_paths += self._children_nodes[k]._merge(v)
             else:
                 self._children_nodes[k] = v
-        return self
+                new_paths += 1 + len(v._descendant_nodes())
+        return new_paths
 
     def _std_with_added_size(self, size):
         n = self._count + 1
@@ -290,21 +461,21 @@ class CollectionStats(metaclass=abc.ABCMeta):
 class MappingNodeStats(CollectionStats):
     priority = 3
 
-    def _populate_children_nodes(self):
-        for k, v in self._node.items():
+    def _populate_children_nodes(self, node):
+        for k, v in node.items():
             self._add_child_node(v, name=k)
 
 
 class IterableNodeStats(CollectionStats):
     priority = 2
 
-    def _populate_children_nodes(self):
-        for i in self._node:
+    def _populate_children_nodes(self, node):
+        for i in node:
             self._add_child_node(i)
 
 
 class PrimitiveNodeStats(CollectionStats):
     priority = 1
 
-    def _populate_children_nodes(self):
+    def _populate_children_nodes(self, node):
         pass
@@ -1,6 +1,10 @@
+from .open_text import open_text
 from .plunk import plunk
 from .read_csv import read_csv
 from .read_json import read_json
 from .read_xml import read_xml
 from .compact import Compact
 from .samples_writer import SamplesWriter
+from .split_records import records_path, split_records
+from .stats_cache import StatsCache
+from .with_values import with_values
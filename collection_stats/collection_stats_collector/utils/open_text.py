@@ -0,0 +1,12 @@
+import io
+
+
+def open_text(file, encoding='utf8'):
+    """
+    :param file:  a path, or a binary file object (e.g. io.BytesIO of a file read already)
+    :param encoding:
+    :return:  text file object, to be closed by the caller
+    """
+    if isinstance(file, io.IOBase):
+        return io.TextIOWrapper(file, encoding=encoding)
+    return open(file, mode='r', encoding=encoding)
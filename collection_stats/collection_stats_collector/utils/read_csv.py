@@ -3,17 +3,19 @@ import csv
 from io import StringIO
 import os
 
+from .open_text import open_text
+
 
 def read_csv(file, *, encoding='utf8', sep=',', keys=(), **kwargs):
     """
-    :param file:
+    :param file:  a path or a binary file object
     :param encoding:
     :param sep:
     :param keys:  names of columns, if not provided, values of the first row are used
     :return:
     """
     buffer = StringIO()
-    with open(file, mode='r', encoding=encoding) as fh:
+    with open_text(file, encoding=encoding) as fh:
         buffer.write(fh.read())
     buffer.seek(os.SEEK_SET)
     reader = csv.reader(buffer, delimiter=sep)
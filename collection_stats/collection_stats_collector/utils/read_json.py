@@ -1,12 +1,14 @@
 import json
 
+from .open_text import open_text
+
 
 def read_json(file, encoding='utf8', json_encoding='utf8', **kwargs):
     """
-    :param file:
+    :param file:  a path or a binary file object
     :param encoding:
-    :param json_encoding
+    :param json_encoding:  ignored, the file is decoded with encoding
     :return:
     """
-    with open(file, mode='r', encoding=encoding) as fh:
-        return json.loads(fh.read(), encoding=json_encoding)
+    with open_text(file, encoding=encoding) as fh:
+        return json.loads(fh.read())
@@ -1,7 +1,7 @@
 import os
 import sys
-import xmltodict
-import xmlschema
+
+from .open_text import open_text
 
 
 def read_xml(
@@ -13,7 +13,7 @@ def read_xml(
         no_validate_schema=False,
         **kwargs):
     """
-    :param file:
+    :param file:  a path or a binary file object
     :param encoding:
     :param process_namespaces:  see https://github.com/martinblech/xmltodict
     :param xml_namespaces:  see https://github.com/martinblech/xmltodict
@@ -24,13 +24,16 @@ def read_xml(
     :param kwargs:  ignored
     :return:
     """
+    # imported here, as both are only needed for xml files and xmlschema is slow to import
+    import xmltodict
     xml_schema = None
     if xml_schema_file:
+        import xmlschema
         xml_schema = xmlschema.XMLSchema(xml_schema_file)
     kwargs = dict(process_namespaces=process_namespaces)
     if xml_namespaces:
         kwargs.update(process_namespaces=True, namespaces=xml_namespaces)
-    with open(file, mode='r', encoding=encoding) as fh:
+    with open_text(file, encoding=encoding) as fh:
         if xml_schema is not None:
             if not no_validate_schema:
                 validation_msg = f"Validation of xsd on target xml"
@@ -10,14 +10,32 @@ import sys
 
 class SamplesWriter:
     def __init__(self, directory, *, max_samples=100, is_xml_like):
+        """
+        :param is_xml_like:  write samples as xml elements / attributes, can be changed
+                             before flush() (e.g. once formats of the added structs are known)
+        """
         self._directory = directory
         self._max_samples = max_samples
-        self._is_xml_like = is_xml_like
+        self.is_xml_like = is_xml_like
+        self._samples = collections.defaultdict(list)
 
     def write(self, struct):
         samples = self._gather_samples(struct)
         self._persist_samples(samples)
 
+    def add(self, struct, path=()):
+        """
+        gathers samples of struct (e.g. a record), see flush()
+
+        :param path:  keys leading to struct, if it's a part of a bigger one
+        """
+        self._gather_samples(struct, path=tuple(path), samples=self._samples)
+
+    def flush(self):
+        """writes samples of the structs added so far"""
+        self._persist_samples(self._samples)
+        self._samples = collections.defaultdict(list)
+
     def _gather_samples(self, struct, *, path=None, samples=None):
         path = path or ()
         samples = samples if samples is not None else collections.defaultdict(list)
@@ -80,7 +98,7 @@ class SamplesWriter:
             selected_samples = top_k + selected_samples
 
             separator = None
-            if self._is_xml_like:
+            if self.is_xml_like:
                 tag_example = tag if tag.startswith('@') else f"<{tag}>"
                 selected_samples = [
                     f'{tag[1:]}="{i}"' if tag.startswith('@') else f"<{tag}>{i}</{tag}>"
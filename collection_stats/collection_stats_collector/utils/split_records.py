@@ -0,0 +1,51 @@
+from .with_values import with_values
+
+
+def split_records(struct):
+    """
+    Yields records of a parsed file one by one, each one wrapped into the path
+    leading to it, so that stats of the records are merged into the same structure
+    the whole file has, e.g.:
+
+    {'root': {'@a': '1', 'item': [a, b]}}  ->  {'root': {'@a': '1', 'item': [a]}},
+                                               {'root': {'@a': '1', 'item': [b]}}
+
+    Records are the items of the list found by records_path(), a struct without
+    such a list is yielded as a single record.
+
+    :param struct:
+    :return:
+    """
+    keys = records_path(struct)
+    if keys is None:
+        yield struct
+        return
+    records = struct
+    for key in keys:
+        records = records[key]
+    for item in records:
+        if keys:
+            yield with_values(struct, keys[:-1], {keys[-1]: [item]})
+        else:
+            yield [item]
+
+
+def records_path(struct):
+    """
+    Finds the list of records by descending dicts having a single dict or list value.
+
+    :param struct:
+    :return:  keys leading to the (non-empty) list of records, () if struct is the list,
+              None if there's no such list
+    """
+    keys = []
+    node = struct
+    while isinstance(node, dict):
+        container_keys = [k for k, v in node.items() if isinstance(v, (dict, list))]
+        if len(container_keys) != 1:
+            break
+        keys.append(container_keys[0])
+        node = node[container_keys[0]]
+    if not isinstance(node, list) or not node:
+        return None
+    return tuple(keys)
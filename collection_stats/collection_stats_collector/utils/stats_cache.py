@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import pickle
+
+
+class StatsCache:
+    """
+    On-disk cache of per-file stats snapshots, keyed by file path, size, mtime
+    and content hash (plus options affecting the stats). Least recently used
+    snapshots are evicted once the cache grows over max_size bytes.
+
+    Content hashes are kept in an index by path, size and mtime, so that a file
+    is read again only if any of them has changed.
+
+    Usage:
+
+    cache = StatsCache(directory, options=dict(plunk=True))
+
+    stats = cache.get(file)
+    if stats is None:
+        stats = collection_stats(read(file))
+        cache.put(file, stats)
+
+    cache.save_index()
+    cache.evict()
+    """
+
+    VERSION = 2
+    SUFFIX = '.pickle'
+    TMP_SUFFIX = '.tmp'
+    INDEX_FILE = 'index.json'
+    HASH_CHUNK_SIZE = 2**20
+
+    def __init__(self, directory, *, max_size=2**30, options=None):
+        """
+        :param directory:  created if not exists
+        :param max_size:  bytes
+        :param options:  whatever affects the stats (reading options etc), has to be repr-able
+        """
+        self._directory = Path(directory)
+        self._max_size = max_size
+        self._options = sorted((options or {}).items())
+        self._keys = {}
+        os.makedirs(self._directory, exist_ok=True)
+        self._index_file = self._directory.joinpath(self.INDEX_FILE)
+        self._index = self._load_index()  # path -> [size, mtime_ns, content hash]
+        self._index_changed = False
+
+    def get(self, file):
+        """
+        :return:  stats snapshot or None if file is new or has changed
+        """
+        entry = self._entry(file)
+        try:
+            with entry.open(mode='rb') as fh:
+                stats = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # broken by an interrupted write of an older version etc
+            entry.unlink()
+            return None
+        os.utime(entry)
+        return stats
+
+    def put(self, file, stats):
+        entry = self._entry(file)
+        tmp = entry.with_name(entry.name + self.TMP_SUFFIX)
+        try:
+            with tmp.open(mode='wb') as fh:
+                pickle.dump(stats, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, entry)
+        except BaseException:
+            tmp.unlink()
+            raise
+
+    def save_index(self):
+        """
+        Saves content hashes of files seen so far, for the next runs.
+        """
+        if not self._index_changed:
+            return
+        index = {k: v for k, v in self._index.items() if os.path.isfile(k)}
+        tmp = self._index_file.with_name(self._index_file.name + '.tmp')
+        with tmp.open(mode='w', encoding='utf8') as fh:
+            json.dump({'version': self.VERSION, 'files': index}, fh)
+        os.replace(tmp, self._index_file)
+        self._index_changed = False
+
+    def evict(self):
+        """
+        Removes least recently used snapshots until the cache fits into max_size,
+        along with the ones left unfinished by interrupted runs.
+        """
+        for tmp in self._directory.glob('*' + self.SUFFIX + self.TMP_SUFFIX):
+            tmp.unlink()
+        entries = []
+        for entry in self._directory.glob('*' + self.SUFFIX):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+        size = sum(i[1] for i in entries)
+        for _, entry_size, entry in entries:
+            if size <= self._max_size:
+                break
+            entry.unlink()
+            size -= entry_size
+
+    def _entry(self, file):
+        file = Path(file).resolve()
+        if file not in self._keys:
+            stat = file.stat()
+            indexed = self._index.get(str(file))
+            if indexed is not None and indexed[:2] == [stat.st_size, stat.st_mtime_ns]:
+                content_hash = indexed[2]
+            else:
+                content_hash = self._content_hash(file)
+                self._index[str(file)] = [stat.st_size, stat.st_mtime_ns, content_hash]
+                self._index_changed = True
+            key = hashlib.sha256(repr((
+                self.VERSION,
+                str(file),
+                stat.st_size,
+                stat.st_mtime_ns,
+                content_hash,
+                self._options,
+            )).encode('utf8'))
+            self._keys[file] = key.hexdigest()
+        return self._directory.joinpath(self._keys[file] + self.SUFFIX)
+
+    def _load_index(self):
+        try:
+            with self._index_file.open(mode='r', encoding='utf8') as fh:
+                index = json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # broken by an interrupted write
+            return {}
+        if not isinstance(index, dict) or index.get('version') != self.VERSION:
+            return {}
+        return index.get('files', {})
+
+    @classmethod
+    def _content_hash(cls, file):
+        content_hash = hashlib.sha256()
+        with file.open(mode='rb') as fh:
+            for chunk in iter(lambda: fh.read(cls.HASH_CHUNK_SIZE), b''):
+                content_hash.update(chunk)
+        return content_hash.hexdigest()
@@ -0,0 +1,20 @@
+
+
+def with_values(struct, path, values):
+    """
+    Sets the values under the path of dict keys, without modifying the struct itself:
+    dicts along the path are copied (missing ones are created), e.g.:
+
+    with_values({'root': {'@a': '1'}}, ['root'], {'item': [a]})  ->  {'root': {'@a': '1', 'item': [a]}}
+
+    :param struct:  a dict or None
+    :param path:  keys of the dict to set the values in
+    :param values:  a mapping of keys to values
+    :return:  a copy of the struct
+    """
+    struct = struct.copy() if isinstance(struct, dict) else {}
+    if path:
+        struct[path[0]] = with_values(struct.get(path[0]), path[1:], values)
+    else:
+        struct.update(values)
+    return struct
@@ -1,5 +1,13 @@
 import click
-from collection_stats.collection_stats_collector import CollectionStatsCollector, utils
+from collection_stats.collection_stats_collector import (
+    CollectionStatsCollector,
+    StreamedCollectionStats,
+    collection_stats,
+    utils,
+)
+from collection_stats.pipeline import FORMATS, Pipeline
+from collection_stats.profiling import Profiler
+import io
 import os
 from pathlib import Path
 import sys
@@ -7,8 +15,11 @@ import traceback
 import shutil
 
 
+READ_CHUNK_SIZE = 2**20
+
+
 @click.command()
-@click.argument('src_file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('src_file', type=click.Path(exists=True, dir_okay=True))
 @click.argument('report_file', type=click.Path(file_okay=True, dir_okay=False))
 @click.option('--plunk', is_flag=True,
               help='don\'t count empty values (null, 0, "", [], {} etc)'
@@ -37,6 +48,33 @@ import shutil
          " (works only if both --xsd option and xml src_file provided)"
 )
 @click.option('--csv-sep', default=',', type=str, help="col separator, used with csv format only")
+@click.option('--discover-schema', type=click.IntRange(min=1), default=None, metavar='N',
+              help="schema discovery: stop once no new paths have appeared for N records"
+                   " and report the structure only")
+@click.option('--cache-dir', type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help="keep stats of every file in this directory and reuse them"
+                   " for files which haven't changed since")
+@click.option('--cache-max-size', type=click.IntRange(min=0), default=1024, show_default=True,
+              metavar='MB', help="evict least recently used stats once the cache grows over it")
+@click.option('--pipeline', is_flag=True,
+              help="read, parse and collect files concurrently, streaming xml/csv records"
+                   " (.gz/.bz2 files are decompressed on the fly)")
+@click.option('--queue-size', type=click.IntRange(min=1), default=64, show_default=True,
+              help="max chunks / batches of values waiting between two --pipeline stages")
+@click.option('--progress', is_flag=True,
+              help="print current stage and bytes/records per second to stderr")
+@click.option('--profile', is_flag=True,
+              help="print per-stage wall time and peak memory to stderr")
+@click.option('--profile-file', type=click.Path(file_okay=True, dir_okay=False), default=None,
+              help="write per-stage wall time and peak memory to this json file")
+@click.option('--profile-stage', default='collect', show_default=True,
+              type=click.Choice(['read', 'parse', 'collect', 'render', 'samples']),
+              help="stage to capture with --cprofile / --tracemalloc")
+@click.option('--cprofile', type=click.Path(file_okay=True, dir_okay=False), default=None,
+              help="dump cProfile stats of the --profile-stage stage to this file")
+@click.option('--tracemalloc', is_flag=True,
+              help="report top allocations of the --profile-stage stage (slows it down),"
+                   " implies --profile")
 @click.option('--debug', is_flag=True, help="prefer more verbose errors (if any)")
 def main(
         src_file,
@@ -51,60 +89,257 @@ def main(
         xsd,
         no_validate_xsd,
         csv_sep,
+        discover_schema,
+        cache_dir,
+        cache_max_size,
+        pipeline,
+        queue_size,
+        progress,
+        profile,
+        profile_file,
+        profile_stage,
+        cprofile,
+        tracemalloc,
         debug,
 ):
     """
     Calculate and save a report about the structure of xml/json file, it's fields'
     types and lengths etc. Optionally dump samples and validate xml file against xml schema.
+    If src_file is a directory, stats of all files in it are merged into one report.
     """
     src_file = Path(src_file)
     report_file = Path(report_file)
+    samples = samples or samples_dir
+    if cache_dir and (samples or discover_schema):
+        raise click.UsageError("--cache-dir can't be used with --samples or --discover-schema")
+    if pipeline and (cache_dir or xsd):
+        raise click.UsageError("--pipeline can't be used with --cache-dir or --xsd")
     os.makedirs(report_file.parent, exist_ok=True)
     if report_file.is_file():
         report_file.unlink()
-    samples = samples or samples_dir
     samples_dir = Path(samples_dir) if samples_dir else report_file.parent.joinpath('samples')
     if samples and samples_dir.is_dir():
         shutil.rmtree(samples_dir)
 
-    format, dct = _read_as_dict(
-        src_file,
-        encoding=encoding,
-        json_encoding=json_encoding,
-        format=format,
-        xml_schema_file=xsd,
-        no_validate_xml_schema=no_validate_xsd,
-        csv_sep=csv_sep,
-        debug=debug,
+    files = _list_files(src_file, exclude=[report_file, samples_dir, cache_dir])
+    if src_file.is_dir() and not format:
+        files = _skip_unknown_formats(files, compressed=pipeline)
+    if not files:
+        raise click.UsageError(f"No files found in '{src_file}'")
+    if pipeline:
+        for file in files:
+            if Pipeline.file_format(file, format) is None:
+                raise click.UsageError(f"Can't detect format of '{file}', use --format")
+
+    cache = None
+    if cache_dir:
+        cache = utils.StatsCache(
+            cache_dir,
+            max_size=cache_max_size * 2**20,
+            options=dict(
+                plunk=plunk,
+                encoding=encoding,
+                json_encoding=json_encoding,
+                format=format,
+                xsd=_file_version(xsd) if xsd else None,
+                csv_sep=csv_sep,
+            ),
+        )
+
+    profiler = Profiler(
+        report=profile or bool(profile_file),
+        progress=progress,
+        hot_stage=profile_stage,
+        cprofile_file=cprofile,
+        tracemalloc=tracemalloc,
     )
 
-    if plunk:
-        utils.plunk(dct)
+    with profiler:
+        collector = CollectionStatsCollector(stable_after=discover_schema, plunk=plunk)
+        formats = set()
+        records_count = 0
+        samples_writer = None
+        if samples:
+            samples_writer = utils.SamplesWriter(
+                samples_dir,
+                max_samples=max_samples,
+                is_xml_like=False,  # set once formats of the files are known
+            )
+
+        if pipeline:
+            formats = {Pipeline.file_format(file, format) for file in files}
+            pipeline_runner = Pipeline(
+                collector,
+                samples_writer=samples_writer,
+                profiler=profiler,
+                queue_size=queue_size,
+                format=format,
+                encoding=encoding,
+                csv_sep=csv_sep,
+            )
+            try:
+                pipeline_runner.run(files)
+            except Exception as exc:
+                error_msg = _format_exception(exc) if debug else str(exc)
+                print(f"Couldn't process '{src_file}':\n{error_msg}", file=sys.stderr)
+                sys.exit(1)
+            records_count = pipeline_runner.records_count
+        else:
+            for file in files:
+                if cache is not None:
+                    with profiler.stage('cache'):
+                        stats = cache.get(file)
+                    if stats is not None:
+                        collector.add_stats(stats)
+                        profiler.add_bytes(file.stat().st_size)
+                        continue
+
+                with profiler.stage('read'):
+                    content = _read_file(file, profiler=profiler)
 
-    collector = CollectionStatsCollector()
+                with profiler.stage('parse'):
+                    file_format, dct = _read_as_dict(
+                        file,
+                        content=content,
+                        encoding=encoding,
+                        json_encoding=json_encoding,
+                        format=format,
+                        xml_schema_file=xsd,
+                        no_validate_xml_schema=no_validate_xsd,
+                        csv_sep=csv_sep,
+                        debug=debug,
+                    )
+                    del content
+                    formats.add(file_format)
 
-    collector.add(dct)
+                with profiler.stage('collect'):
+                    if discover_schema:
+                        for record in utils.split_records(dct):
+                            collector.add(record)
+                            profiler.add_records(1)
+                            records_count += 1
+                            if samples_writer is not None:
+                                samples_writer.add(record)
+                            if collector.is_stable:
+                                break
+                    else:
+                        stats = _collection_stats(dct, plunk=plunk, profiler=profiler)
+                        collector.add_stats(stats)
+                        if samples_writer is not None:
+                            samples_writer.add(dct)
 
-    report = str(collector)
+                if cache is not None:
+                    with profiler.stage('cache'):
+                        cache.put(file, stats)
 
-    with report_file.open(mode='w', encoding='utf8') as f:
-        f.write(report+'\n')
-        print(f"written '{report_file}'", file=sys.stderr)
+                if collector.is_stable:
+                    break
 
-    if not samples:
-        return
+        if discover_schema:
+            print(f"structure discovered from {records_count} records", file=sys.stderr)
 
-    samples_writer = utils.SamplesWriter(
-        samples_dir,
-        max_samples=max_samples,
-        is_xml_like=format == 'xml',
-    )
-    samples_writer.write(dct)
+        if cache is not None:
+            with profiler.stage('cache'):
+                cache.save_index()
+                cache.evict()
+
+        with profiler.stage('render'):
+            if discover_schema:
+                report = collector.format(include_samples=False, structure_only=True)
+            else:
+                report = str(collector)
+            with report_file.open(mode='w', encoding='utf8') as f:
+                f.write(report+'\n')
+                print(f"written '{report_file}'", file=sys.stderr)
+
+        if samples_writer is not None:
+            with profiler.stage('samples'):
+                samples_writer.is_xml_like = formats == {'xml'}
+                samples_writer.flush()
+
+    profiler.write_report(json_file=profile_file)
+
+
+def _list_files(path, *, exclude=()):
+    """
+    :param path:  a file or a directory to list files (except hidden ones) from recursively
+    :param exclude:  files or directories to skip
+    :return:
+    """
+    if path.is_file():
+        return [path]
+    exclude = [Path(i).resolve() for i in exclude if i]
+    files = []
+    for file in sorted(path.rglob('*')):
+        if not file.is_file() or any(i.startswith('.') for i in file.relative_to(path).parts):
+            continue
+        resolved = file.resolve()
+        if any(resolved == i or i in resolved.parents for i in exclude):
+            continue
+        files.append(file)
+    return files
+
+
+def _file_version(file):
+    """
+    :return:  path, size and mtime of the file, which change along with its content
+    """
+    stat = os.stat(file)
+    return str(Path(file).resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def _skip_unknown_formats(files, *, compressed):
+    """
+    :param files:  listed from a directory, which may have other files (readme etc) too
+    :param compressed:  gz / bz2 compressed files can be read (by the pipeline)
+    :return:  files having csv / json / xml extension
+    """
+    known_files = []
+    for file in files:
+        file_format = Pipeline.file_format(file) if compressed else file.suffix[1:].lower()
+        if file_format in FORMATS:
+            known_files.append(file)
+        else:
+            print(f"skipping '{file}': unknown format, use --format to read it", file=sys.stderr)
+    return known_files
+
+
+def _read_file(file, *, profiler):
+    """
+    :return:  contents of the file, bytes are counted by the profiler as they're read
+    """
+    chunks = []
+    with file.open(mode='rb') as fh:
+        for chunk in iter(lambda: fh.read(READ_CHUNK_SIZE), b''):
+            chunks.append(chunk)
+            profiler.add_bytes(len(chunk))
+    return b''.join(chunks)
+
+
+def _collection_stats(dct, *, plunk, profiler):
+    """
+    :return:  stats of a parsed file, the same as collection_stats(dct), but records of it
+              (see utils.split_records) are added one by one and counted by the profiler
+    """
+    keys = utils.records_path(dct)
+    if keys is None:
+        profiler.add_records(1)
+        return collection_stats(dct, plunk=plunk)
+    records = dct
+    for key in keys:
+        records = records[key]
+    path, key = (keys[:-1], keys[-1]) if keys else ((), None)
+    streamed = StreamedCollectionStats(plunk=plunk)
+    for record in records:
+        streamed.add(path, key, record)
+        profiler.add_records(1)
+    return streamed.build(dct)
 
 
 def _read_as_dict(
         file,
         *,
+        content,
         encoding,
         json_encoding,
         format,
@@ -113,6 +348,11 @@ def _read_as_dict(
         csv_sep,
         debug,
 ):
+    """
+    :param file:  used for its name (extension, error messages)
+    :param content:  of the file, read already
+    :return:  (format, parsed file)
+    """
     readers = {
         'xml': utils.read_xml,
         'csv': utils.read_csv,
@@ -128,7 +368,7 @@ def _read_as_dict(
     for format, reader_func in readers.items():
         try:
             dct = reader_func(
-                file,
+                io.BytesIO(content),
                 encoding=encoding,
                 json_encoding=json_encoding,
                 xml_schema_file=xml_schema_file,
@@ -0,0 +1,384 @@
+import codecs
+import collections
+import csv
+import io
+import json
+import queue
+import threading
+
+from collection_stats.collection_stats_collector import StreamedCollectionStats, utils
+from collection_stats.profiling import Profiler
+
+
+_END = object()
+
+COMPRESSIONS = ('gz', 'bz2')
+FORMATS = ('csv', 'json', 'xml')
+
+
+class Pipeline:
+    """
+    Reads, parses and collects files in stages running concurrently, connected
+    by bounded queues (a stage blocks once the next one falls behind):
+
+    reader (file / decompressor chunks) -> parser (events) -> collector
+                                                           -> samples writer (optional)
+
+    xml and csv files are parsed incrementally: the parser emits csv rows and xml
+    elements under the root one by one ('values' events), the rest of a file follows
+    ('document' event), see StreamedCollectionStats. The report is the same as of
+    files parsed whole, except for text of an xml root element mixed with child
+    elements, which is skipped. json files are parsed whole.
+
+    With stable_after (schema discovery) every row / element is collected as a record
+    wrapped into its path, json files are split into records by utils.split_records,
+    and the pipeline stops early once the collector's structure is stable (see
+    CollectionStatsCollector.is_stable).
+
+    Usage:
+
+    pipeline = Pipeline(collector, samples_writer=samples_writer)
+    pipeline.run(files)
+    samples_writer.flush()
+    """
+
+    CHUNK_SIZE = 2**20
+    BATCH_SIZE = 100
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, collector, *, samples_writer=None, profiler=None, queue_size=64,
+                 format=None, encoding='utf8', csv_sep=','):
+        """
+        :param collector:  CollectionStatsCollector
+        :param samples_writer:  SamplesWriter, values are added to it, flushing is up to the caller
+        :param profiler:  Profiler, every stage is profiled separately
+        :param queue_size:  max chunks / batches of events waiting between two stages
+        :param format:  [csv|json|xml], detected by file extension if not provided
+        :param encoding:  of files
+        :param csv_sep:  col separator, used with csv format only
+        """
+        self._collector = collector
+        self._discovery = collector._stable_after is not None
+        self._samples_writer = samples_writer
+        self._profiler = profiler if profiler is not None else Profiler()
+        self._queue_size = queue_size
+        self._format = format
+        self._encoding = codecs.lookup(encoding).name
+        self._csv_sep = csv_sep
+
+        self.records_count = 0
+        self._stop = threading.Event()
+        self._errors = []
+
+    @classmethod
+    def file_format(cls, file, format=None):
+        """
+        :return:  format of file or None if it can't be detected
+        """
+        if format:
+            return format.lower()
+        suffixes = file.name.lower().split('.')[1:]
+        if suffixes and suffixes[-1] in COMPRESSIONS:
+            suffixes.pop()
+        if suffixes and suffixes[-1] in FORMATS:
+            return suffixes[-1]
+        return None
+
+    def run(self, files):
+        chunks = queue.Queue(maxsize=self._queue_size)
+        collector_events = queue.Queue(maxsize=self._queue_size)
+        events_queues = [collector_events]
+        stages = [
+            ('read', self._read, (files, chunks)),
+            ('parse', self._parse, (chunks, events_queues)),
+            ('collect', self._collect, (collector_events, )),
+        ]
+        if self._samples_writer is not None:
+            samples_events = queue.Queue(maxsize=self._queue_size)
+            events_queues.append(samples_events)
+            stages.append(('samples', self._gather_samples, (samples_events, )))
+        threads = [
+            threading.Thread(
+                target=self._run_stage, args=stage, name=f'pipeline-{stage[0]}', daemon=True,
+            )
+            for stage in stages
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            self._stop.set()
+            raise
+        if self._errors:
+            raise self._errors[0]
+
+    def _run_stage(self, name, func, args):
+        try:
+            with self._profiler.stage(name):
+                func(*args)
+        except _Stopped:
+            pass
+        except BaseException as exc:
+            self._errors.append(exc)
+            self._stop.set()
+
+    def _read(self, files, chunks):
+        for file in files:
+            self._put(chunks, file)
+            with self._open(file) as fh:
+                for chunk in iter(lambda: fh.read(self.CHUNK_SIZE), b''):
+                    self._put(chunks, chunk)
+                    self._profiler.add_bytes(len(chunk))
+            self._put(chunks, None)
+        self._put(chunks, _END)
+
+    def _parse(self, chunks, events_queues):
+        """
+        Emits events of every file:
+
+        ('document', collection, single_as_value)  the file without values emitted separately,
+                                                   once per file, see StreamedCollectionStats
+        ('values', path, [(key, value), ...])  values (a record: csv row, xml element)
+                                               of keys of the mapping at the path of keys
+        ('record', record)  a record of a json file wrapped into its path, schema discovery only
+        ('end', )  end of the file
+        """
+        parsers = {
+            'csv': self._parse_csv,
+            'json': self._parse_json,
+            'xml': self._parse_xml,
+        }
+
+        # events are handed over in batches, as queues are too slow to pass them one by one
+        batch = []
+
+        def emit(*event):
+            batch.append(event)
+            if len(batch) >= self.BATCH_SIZE:
+                flush()
+
+        def flush():
+            for events in events_queues:
+                self._put(events, list(batch))
+            batch.clear()
+
+        while True:
+            file = self._get(chunks)
+            if file is _END:
+                break
+            raw = _ChunksIO(self, chunks)
+            parsers[self.file_format(file, self._format)](raw, emit)
+            raw.drain()
+            emit('end')
+        if batch:
+            flush()
+        for events in events_queues:
+            self._put(events, _END)
+
+    def _collect(self, events):
+        streamed = None
+        document = None
+        file_records = 0
+        while True:
+            batch = self._get(events)
+            if batch is _END:
+                break
+            records_count = self.records_count
+            for event in batch:
+                if event[0] == 'values':
+                    _, path, values = event
+                    file_records += 1
+                    self.records_count += 1
+                    if self._discovery:
+                        record = utils.with_values(document, path, {k: [v] for k, v in values})
+                        self._collector.add(record)
+                    else:
+                        for key, value in values:
+                            streamed.add(path, key, value)
+                elif event[0] == 'record':
+                    file_records += 1
+                    self.records_count += 1
+                    self._collector.add(event[1])
+                elif event[0] == 'document':
+                    _, document, single_as_value = event
+                    streamed = StreamedCollectionStats(
+                        plunk=self._collector._plunk, single_as_value=single_as_value,
+                    )
+                else:
+                    if not self._discovery:
+                        self._collector.add_stats(streamed.build(document))
+                    elif not file_records:
+                        self._collector.add(document)
+                    if not file_records:
+                        # a file without records is a record itself
+                        self.records_count += 1
+                    document, streamed, file_records = None, None, 0
+                if self._collector.is_stable:
+                    self._profiler.add_records(self.records_count - records_count)
+                    self._stop.set()
+                    return
+            self._profiler.add_records(self.records_count - records_count)
+
+    def _gather_samples(self, events):
+        while True:
+            batch = self._get(events)
+            if batch is _END:
+                break
+            for event in batch:
+                if event[0] == 'values':
+                    _, path, values = event
+                    for key, value in values:
+                        self._samples_writer.add(value, path=path + (key, ))
+                elif event[0] in ('document', 'record'):
+                    self._samples_writer.add(event[1])
+
+    def _parse_csv(self, raw, emit):
+        # newlines are translated like utils.read_csv does
+        text = io.TextIOWrapper(io.BufferedReader(raw), encoding=self._encoding)
+        reader = csv.reader(text, delimiter=self._csv_sep)
+        keys = next(reader, None)
+        emit('document', {}, False)
+        for row in reader:
+            emit('values', (), list(zip(keys, row)))
+
+    def _parse_json(self, raw, emit):
+        text = io.TextIOWrapper(io.BufferedReader(raw), encoding=self._encoding)
+        document = json.load(text)
+        if self._discovery:
+            # split, so that discovery can stop before all the records are collected
+            for record in utils.split_records(document):
+                emit('record', record)
+        else:
+            emit('document', document, False)
+
+    def _parse_xml(self, raw, emit):
+        import xmltodict
+
+        root = []
+
+        def item_callback(path, item):
+            (root_tag, root_attributes), (tag, attributes) = path
+            if not root:
+                root.append(root_tag)
+                raw.stop_keeping()
+                document = collections.OrderedDict([(root_tag, _xml_value(root_attributes))])
+                # xmltodict maps a single element to itself, repeated ones to a list
+                emit('document', document, True)
+            emit('values', (root_tag, ), [(tag, _xml_value(attributes, item))])
+            return True
+
+        # the root element isn't passed to item_callback, a file without elements under
+        # it (which is kept in memory until one is found) is parsed again whole
+        raw.keep()
+        xmltodict.parse(
+            io.BufferedReader(raw),
+            encoding=self._encoding,
+            item_depth=2,
+            item_callback=item_callback,
+        )
+        if not root:
+            emit('document', xmltodict.parse(raw.kept(), encoding=self._encoding), True)
+
+    def _open(self, file):
+        compression = file.name.lower().rsplit('.', 1)[-1]
+        if compression == 'gz':
+            import gzip
+            return gzip.open(file, mode='rb')
+        elif compression == 'bz2':
+            import bz2
+            return bz2.open(file, mode='rb')
+        return open(file, mode='rb')
+
+    def _put(self, q, item):
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                q.put(item, timeout=self.POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                return q.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _ChunksIO(io.RawIOBase):
+    """Raw binary stream of a file's chunks, which the reader stage puts into the queue"""
+
+    def __init__(self, pipeline, chunks):
+        super().__init__()
+        self._pipeline = pipeline
+        self._chunks = chunks
+        self._chunk = b''
+        self._position = 0
+        self._eof = False
+        self._kept = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._position >= len(self._chunk):
+            if self._eof:
+                return 0
+            chunk = self._pipeline._get(self._chunks)
+            if chunk is None:
+                self._eof = True
+                return 0
+            self._chunk, self._position = chunk, 0
+            if self._kept is not None:
+                self._kept.append(chunk)
+        size = min(len(buffer), len(self._chunk) - self._position)
+        buffer[:size] = self._chunk[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def keep(self):
+        """keeps chunks read from now on, see kept()"""
+        self._kept = []
+
+    def stop_keeping(self):
+        self._kept = None
+
+    def kept(self):
+        """:return:  bytes read since keep()"""
+        return b''.join(self._kept)
+
+    def drain(self):
+        """skips the rest of the file (if the parser hasn't read it all)"""
+        self._chunk, self._position = b'', 0
+        while not self._eof:
+            if self._pipeline._get(self._chunks) is None:
+                self._eof = True
+
+
+def _xml_value(attributes, item=None):
+    """
+    :param attributes:  of an element, see xmltodict item_callback
+    :param item:  contents of the element without its attributes
+    :return:  the element like xmltodict parses it
+    """
+    if isinstance(item, str):
+        # xmltodict strips text of elements, except of the ones passed to item_callback
+        item = item.strip() or None
+    if not attributes:
+        return item
+    value = collections.OrderedDict(('@' + k, v) for k, v in attributes.items())
+    if isinstance(item, dict):
+        value.update(item)
+    elif item is not None:
+        value['#text'] = item
+    return value
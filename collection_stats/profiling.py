@@ -0,0 +1,209 @@
+import contextlib
+import json
+import sys
+import threading
+import time
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+class Profiler:
+    """
+    Per-stage wall time / peak memory breakdown and live progress of a cli run,
+    does nothing unless enabled. Timings of a stage entered several times are summed,
+    stages may run concurrently in separate threads.
+
+    Memory is measured by the process-wide peak RSS (there's no per-thread one): a stage
+    reports how much the peak grew while it ran, plus the peak of the process when it
+    finished. Growth of concurrent stages is attributed to each of them.
+
+    Usage:
+
+    profiler = Profiler(report=True, progress=True, hot_stage='collect', cprofile_file='out.prof')
+
+    with profiler:  # runs the progress reporter
+        with profiler.stage('read'):
+            ...
+            profiler.add_bytes(size)
+        with profiler.stage('collect'):
+            for record in records:
+                ...
+                profiler.add_records(1)
+
+    profiler.write_report(json_file='profile.json')
+    """
+
+    PROGRESS_INTERVAL = 1.0
+    TRACEMALLOC_TOP = 10
+
+    def __init__(self, *, report=False, progress=False, hot_stage=None,
+                 cprofile_file=None, tracemalloc=False):
+        """
+        :param report:  gather per-stage timings and memory for write_report()
+        :param progress:  periodically print bytes/records per second to stderr
+        :param hot_stage:  name of the stage to capture with cProfile / tracemalloc
+        :param cprofile_file:  dump cProfile stats of the hot stage to this file
+        :param tracemalloc:  trace allocations of the hot stage (slows it down a lot),
+                             enables the report
+        """
+        self._report = report or tracemalloc
+        self._progress = progress
+        self._hot_stage = hot_stage
+        self._cprofile_file = cprofile_file
+        self._tracemalloc = tracemalloc
+        self._enabled = report or progress or bool(cprofile_file) or tracemalloc
+
+        self._start = time.perf_counter()
+        self._stages = {}
+        self._active_stages = []
+        self._bytes = 0
+        self._records = 0
+        self._cprofile = None
+        self._tracemalloc_stats = None
+
+        self._progress_thread = None
+        self._progress_stop = threading.Event()
+
+    def __enter__(self):
+        if self._progress:
+            self._progress_thread = threading.Thread(target=self._print_progress, daemon=True)
+            self._progress_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._progress_thread is not None:
+            self._progress_stop.set()
+            self._progress_thread.join()
+            self._progress_thread = None
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(self._cprofile_file)
+            self._cprofile = None
+            print(f"written '{self._cprofile_file}'", file=sys.stderr)
+
+    def add_bytes(self, count):
+        self._bytes += count
+
+    def add_records(self, count):
+        self._records += count
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self._enabled:
+            yield
+            return
+        self._active_stages.append(name)
+        start = time.perf_counter()
+        start_rss = peak_rss_mb()
+        try:
+            if name == self._hot_stage:
+                with self._capture():
+                    yield
+            else:
+                yield
+        finally:
+            stage = self._stages.setdefault(
+                name, {'name': name, 'seconds': 0, 'calls': 0, 'peak_rss_growth_mb': 0},
+            )
+            stage['seconds'] += time.perf_counter() - start
+            stage['calls'] += 1
+            stage['peak_rss_mb'] = peak_rss_mb()
+            if stage['peak_rss_mb'] is None:
+                stage['peak_rss_growth_mb'] = None
+            else:
+                stage['peak_rss_growth_mb'] += stage['peak_rss_mb'] - start_rss
+            self._active_stages.remove(name)
+
+    def write_report(self, json_file=None):
+        """
+        :param json_file:  write the report as json to this file instead of stderr
+        """
+        if not self._report:
+            return
+        report = {
+            'seconds': time.perf_counter() - self._start,
+            'bytes': self._bytes,
+            'records': self._records,
+            'stages': list(self._stages.values()),
+        }
+        if self._tracemalloc_stats is not None:
+            report['tracemalloc'] = self._tracemalloc_stats
+        if json_file:
+            with open(json_file, mode='w', encoding='utf8') as fh:
+                json.dump(report, fh, indent=2)
+            print(f"written '{json_file}'", file=sys.stderr)
+            return
+        lines = [f"{'stage':<12} {'wall s':>10} {'peak rss +MB':>13} {'process peak MB':>16}"]
+        for stage in self._stages.values():
+            growth, peak = (
+                f'{i:.1f}' if i is not None else '?'
+                for i in (stage['peak_rss_growth_mb'], stage['peak_rss_mb'])
+            )
+            lines.append(f"{stage['name']:<12} {stage['seconds']:>10.3f} {growth:>13} {peak:>16}")
+        lines.append(f"{'total':<12} {report['seconds']:>10.3f}")
+        if self._tracemalloc_stats is not None:
+            lines.append(f"\ntop allocations of '{self._hot_stage}'"
+                         f" (peak {self._tracemalloc_stats['peak_mb']:.1f} MB):")
+            for i in self._tracemalloc_stats['top']:
+                lines.append(f"{i['size_mb']:>10.1f} MB {i['count']:>10} blocks  {i['location']}")
+        print('\n'.join(lines), file=sys.stderr)
+
+    @contextlib.contextmanager
+    def _capture(self):
+        """cProfile stats are accumulated, allocations are kept for the entry with the highest peak"""
+        if self._cprofile_file and self._cprofile is None:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+        if self._tracemalloc:
+            import tracemalloc
+            tracemalloc.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        try:
+            yield
+        finally:
+            if self._cprofile is not None:
+                self._cprofile.disable()
+            if self._tracemalloc:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                if self._tracemalloc_stats is None \
+                        or self._tracemalloc_stats['peak_mb'] < peak / 2**20:
+                    self._tracemalloc_stats = {
+                        'peak_mb': peak / 2**20,
+                        'top': [
+                            {
+                                'location': str(i.traceback),
+                                'size_mb': i.size / 2**20,
+                                'count': i.count,
+                            }
+                            for i in snapshot.statistics('lineno')[:self.TRACEMALLOC_TOP]
+                        ],
+                    }
+
+    def _print_progress(self):
+        interactive = sys.stderr.isatty()
+        while not self._progress_stop.wait(self.PROGRESS_INTERVAL):
+            elapsed = time.perf_counter() - self._start
+            line = f"[{'+'.join(self._active_stages) or '-'}] {elapsed:.0f}s"
+            if self._bytes:
+                line += f", {self._bytes / 2**20:.1f} MB ({self._bytes / 2**20 / elapsed:.1f} MB/s)"
+            if self._records:
+                line += f", {self._records} records ({self._records / elapsed:.0f} rec/s)"
+            if interactive:
+                print(f"\r{line}\x1b[K", end='', file=sys.stderr, flush=True)
+            else:
+                print(line, file=sys.stderr, flush=True)
+        if interactive:
+            print(file=sys.stderr)
+
+
+def peak_rss_mb():
+    """:return:  peak resident set size of the process so far, None if unknown"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on mac, kilobytes elsewhere
+    return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10
@@ -0,0 +1,185 @@
+import collections
+import copy
+import random
+
+import pytest
+
+from collection_stats import CollectionStatsCollector
+from collection_stats.collection_stats_collector import StreamedCollectionStats, collection_stats, utils
+
+
+def test_empty_collector():
+    collector = CollectionStatsCollector()
+
+    assert collector.count == 0
+    assert str(collector) == collector.EMPTY
+    assert collector.format(structure_only=True) == collector.EMPTY
+
+
+def test_different_root_types():
+    collector = CollectionStatsCollector()
+    collector.add(collections.OrderedDict([('a', '1')]))
+    collector.add({'a': '2'})
+    collector.add([1])
+
+    assert collector.count == 3
+    assert str(collector) == '\n'.join([
+        str(collection_stats({'a': '1'}) + collection_stats({'a': '2'})),
+        str(collection_stats([1])),
+    ])
+
+
+@pytest.mark.parametrize('plunk', [False, True])
+def test_streamed_stats(plunk):
+    items = [collections.OrderedDict([('@id', '1'), ('x', '1')]), None, 'a', {'y': ['', '2']}]
+    streamed = StreamedCollectionStats(uid=1, plunk=plunk, single_as_value=True)
+    for item in items:
+        streamed.add(['root'], 'item', item)
+    streamed.add(['root'], 'single', '')
+    streamed.add(['root', 'nested'], 'single', {'a': 1})
+    document = {'root': {'@a': '1'}}
+
+    stats = streamed.build(document)
+
+    assert document == {'root': {'@a': '1'}}
+    assert str(stats) == str(collection_stats(
+        {'root': {'@a': '1', 'item': items, 'single': '', 'nested': {'single': {'a': 1}}}},
+        uid=1,
+        plunk=plunk,
+    ))
+
+
+def test_stable_after():
+    collector = CollectionStatsCollector(stable_after=2)
+    assert not collector.is_stable
+
+    collector.add({'a': 1})
+    collector.add({'a': 2})
+    assert not collector.is_stable
+    collector.add({'a': 3})
+    assert collector.is_stable
+
+    collector.add({'a': 4, 'b': {'c': 1}})
+    assert not collector.is_stable
+    collector.add({'a': 5})
+    collector.add({'a': 6, 'b': {}})
+    assert collector.is_stable
+
+    collector.add([1])
+    assert not collector.is_stable
+
+
+def test_not_stable_without_stable_after():
+    collector = CollectionStatsCollector()
+    for i in range(10):
+        collector.add({'a': i})
+
+    assert not collector.is_stable
+
+
+@pytest.mark.parametrize('collection, other, new_paths', [
+    ({'a': 1}, {'a': 2}, 0),
+    ({'a': 1, 'b': 2}, {'a': 2}, 0),
+    ({'a': 1}, {'b': 2}, 1),
+    # the new key and everything under it
+    ({'a': 1}, {'b': {'c': [1, {'d': 1}]}}, 5),
+    # deep in a subtree
+    ({'a': [{'b': {'c': 1}}]}, {'a': [{'b': {'c': 1, 'd': 1}}]}, 1),
+    ({'a': [{'b': {'c': 1}}]}, {'a': [{'b': {'c': 1}}, {'e': [1]}]}, 2),
+])
+def test_merge_counts_new_paths(collection, other, new_paths):
+    stats = collection_stats(collection)
+
+    assert stats._merge(collection_stats(other)) == new_paths
+
+
+def test_new_root_type_is_a_new_path():
+    collector = CollectionStatsCollector(stable_after=1)
+    collector.add({'a': 1})
+    collector.add({'a': 1})
+    assert collector.is_stable
+
+    collector.add(['a'])
+    assert not collector.is_stable
+    collector.add(['b'])
+    assert collector.is_stable
+
+
+def test_structure_only():
+    collector = CollectionStatsCollector()
+    collector.add({'a': [{'b': 1}, {'b': 2}]})
+    collector.add(['x'])
+
+    assert collector.format(structure_only=True) == '\n'.join([
+        'dict',
+        "  └ 'a':",
+        '      list',
+        '        └ dict',
+        "            └ 'b':",
+        '                int',
+        'list',
+        '  └ str',
+    ])
+
+
+@pytest.mark.parametrize('struct, records', [
+    ({'root': {'@a': '1', 'item': [1, 2]}}, [{'root': {'@a': '1', 'item': [1]}}, {'root': {'@a': '1', 'item': [2]}}]),
+    ([{'a': 1}, {'a': 2}], [[{'a': 1}], [{'a': 2}]]),
+    ({'a': {'b': {'c': ['x']}}}, [{'a': {'b': {'c': ['x']}}}]),
+    ({'a': 1}, [{'a': 1}]),
+    ({'items': []}, [{'items': []}]),
+    # there's no single list of records
+    ({'a': [1, 2], 'b': [3, 4]}, [{'a': [1, 2], 'b': [3, 4]}]),
+])
+def test_split_records(struct, records):
+    assert list(utils.split_records(struct)) == records
+
+
+def test_split_records_leaves_struct_intact():
+    struct = {'root': {'@a': '1', 'item': [1, 2]}}
+
+    for _ in utils.split_records(struct):
+        pass
+
+    assert struct == {'root': {'@a': '1', 'item': [1, 2]}}
+
+
+def random_struct(rnd, depth=0):
+    kind = rnd.choice(['dict', 'list'] + ['value'] * depth)
+    if kind == 'dict':
+        return {rnd.choice('abc'): random_struct(rnd, depth + 1) for _ in range(rnd.randint(0, 3))}
+    if kind == 'list':
+        return [random_struct(rnd, depth + 1) for _ in range(rnd.randint(0, 3))]
+    return rnd.choice([None, 0, 1, '', 'x', 0.0, 1.5, False, True])
+
+
+PLUNK_CASES = [
+    {'a': None, 'b': 0, 'c': '', 'd': [], 'e': {}, 'f': 1},
+    [0, 1, '', 'x', None, [], {}],
+    {'a': [{'b': 0}, {'b': 1}, {}], 'c': {'d': [0, 0]}},
+    [[0], [], [1, 0]],
+]
+
+
+@pytest.mark.parametrize('collections_', [[i] for i in PLUNK_CASES] + [
+    [random_struct(random.Random(seed)) for _ in range(5)] for seed in range(50)
+])
+def test_plunk_equals_collecting_plunked_copies(collections_):
+    collector = CollectionStatsCollector(plunk=True)
+    plunked_collector = CollectionStatsCollector()
+    originals = copy.deepcopy(collections_)
+
+    for collection in collections_:
+        collector.add(collection)
+        plunked_collector.add(utils.plunk(copy.deepcopy(collection)))
+
+    assert collections_ == originals
+    assert str(collector) == str(plunked_collector)
+
+
+def test_plunk_list():
+    struct = [1, 0, 0, [0, '', 2], {'a': 0}]
+
+    assert utils.plunk(struct) == [1, [2], {}]
+    assert utils.plunk([1, 0, 0]) == [1]
+    assert utils.plunk([0, 0]) == []
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from collection_stats.entrypoint import main
+
+
+def run(*args):
+    """runs the cli in this process (like click's CliRunner, which doesn't capture prints to stderr)"""
+    main.main([str(i) for i in args], standalone_mode=False)
+
+
+def write_files(directory, files):
+    directory.mkdir(exist_ok=True)
+    for name, content in files.items():
+        directory.joinpath(name).write_text(content, encoding='utf8')
+    return directory
+
+
+def test_directory_with_mixed_root_types(tmp_path):
+    src = write_files(tmp_path / 'src', {
+        'list.json': '[{"a": 1}, {"a": 2}]',
+        'dict.json': '{"a": 1}',
+        'doc.xml': '<root><a>1</a></root>',
+        'table.csv': 'a,b\n1,2\n',
+    })
+    report_file = tmp_path / 'report.txt'
+
+    run(src, report_file)
+
+    report = report_file.read_text(encoding='utf8')
+    # xml (OrderedDict) and json / csv dicts are merged, the list is reported separately
+    assert report.startswith('3 dict ')
+    assert '\n1 list size 2 \n' in report
+    assert "'root':" in report
+
+
+def test_cached_report_equals_uncached(tmp_path):
+    src = write_files(tmp_path / 'src', {
+        'a.json': '[{"a": 1}, {"a": null}]',
+        'b.json': '[{"a": "x", "b": [1, 2, 3]}]',
+        'c.xml': '<root><item id="1">x</item><item id="2"/></root>',
+    })
+    cache_dir = tmp_path / 'cache'
+
+    def report(*args):
+        run(src, tmp_path / 'report.txt', '--plunk', *args)
+        return (tmp_path / 'report.txt').read_text(encoding='utf8')
+
+    uncached = report()
+    assert report('--cache-dir', cache_dir) == uncached
+    entries = sorted(cache_dir.glob('*.pickle'))
+    assert len(entries) == 3
+    assert report('--cache-dir', cache_dir) == uncached
+    assert sorted(cache_dir.glob('*.pickle')) == entries
+
+    src.joinpath('b.json').write_text('[{"a": "x", "b": []}, {"c": 1}]', encoding='utf8')
+    assert report('--cache-dir', cache_dir) == report()
+    assert len(list(cache_dir.glob('*.pickle'))) == 4
+
+
+@pytest.mark.parametrize('args', [(), ('--pipeline', )])
+def test_directory_files_of_unknown_format_are_skipped(tmp_path, capsys, args):
+    src = write_files(tmp_path / 'src', {
+        'README': 'about the data',
+        'notes.txt': 'more about the data',
+        'data.json': '[1, 2]',
+    })
+
+    run(src, tmp_path / 'report.txt', *args)
+
+    stderr = capsys.readouterr().err
+    assert 'README' in stderr
+    assert 'notes.txt' in stderr
+    assert (tmp_path / 'report.txt').read_text(encoding='utf8').startswith('1 list size 2')
+
+
+def test_unparseable_file_is_named(tmp_path, capsys):
+    src = write_files(tmp_path / 'src', {
+        'a.json': '[1, 2]',
+        'b.json': '[1, ',
+    })
+
+    with pytest.raises(SystemExit) as exc_info:
+        run(src, tmp_path / 'report.txt')
+
+    assert exc_info.value.code == 1
+    stderr = capsys.readouterr().err
+    assert "Couldn't parse file" in stderr
+    assert 'b.json' in stderr
+
+
+def test_profile_stages(tmp_path):
+    src = write_files(tmp_path / 'src', {'a.xml': '<root><item>1</item><item>2</item></root>'})
+    profile_file = tmp_path / 'profile.json'
+
+    run(
+        src / 'a.xml', tmp_path / 'report.txt', '--profile-file', profile_file,
+        '--profile-stage', 'parse', '--cprofile', tmp_path / 'parse.prof',
+    )
+
+    profile = json.loads(profile_file.read_text(encoding='utf8'))
+    assert [i['name'] for i in profile['stages']] == ['read', 'parse', 'collect', 'render']
+    assert profile['bytes'] == (src / 'a.xml').stat().st_size
+    assert profile['records'] == 2
+    assert (tmp_path / 'parse.prof').stat().st_size
+
+
+@pytest.mark.parametrize('args', [(), ('--pipeline', ), ('--discover-schema', 10)])
+def test_samples_of_all_files(tmp_path, args):
+    src = write_files(tmp_path / 'src', {
+        'a.xml': '<root><item id="1">x</item><item id="2">y</item></root>',
+        'b.xml': '<root><item id="3">z</item></root>',
+    })
+
+    run(src, tmp_path / 'report.txt', '--samples', *args)
+
+    item_dir = tmp_path / 'samples' / 'root' / 'item'
+    item_samples = (item_dir / '$text.txt').read_text(encoding='utf8')
+    assert '** unique: 3, total: 3 **' in item_samples
+    assert all(f'<#text>{i}</#text>' in item_samples for i in 'xyz')
+    assert (item_dir / '@id.txt').exists()
+
+
+def test_changed_xsd_misses_the_cache(tmp_path):
+    src = write_files(tmp_path / 'src', {'a.xml': '<root><v>1</v></root>'})
+    xsd = tmp_path / 'schema.xsd'
+    cache_dir = tmp_path / 'cache'
+
+    def report(v_type):
+        xsd.write_text(
+            '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">'
+            '<xs:element name="root"><xs:complexType><xs:sequence>'
+            f'<xs:element name="v" type="xs:{v_type}"/>'
+            '</xs:sequence></xs:complexType></xs:element></xs:schema>',
+            encoding='utf8',
+        )
+        run(src, tmp_path / 'report.txt', '--xsd', xsd, '--cache-dir', cache_dir)
+        return (tmp_path / 'report.txt').read_text(encoding='utf8')
+
+    assert 'str' in report('string')
+    assert 'int' in report('integer')
+    assert len(list(cache_dir.glob('*.pickle'))) == 2
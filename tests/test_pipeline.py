@@ -0,0 +1,216 @@
+import gzip
+import json
+import queue
+
+import pytest
+
+from collection_stats import CollectionStatsCollector
+from collection_stats.collection_stats_collector import utils
+from collection_stats.pipeline import Pipeline, _ChunksIO
+from collection_stats.profiling import Profiler
+
+
+FILES = {
+    'items.xml': '<root a="1"><item id="1">x</item><item id="2"/><item><q>1</q><q>2</q></item>'
+                 '<single> s </single><empty> </empty></root>',
+    'single_item.xml': '<root><item><a>1</a></item></root>',
+    'empty_root.xml': '<root/>',
+    'root_attributes.xml': '<root a="1">text</root>',
+    'rows.csv': 'a,b,c\n1,,3\n4,5\n6,7,8,9\n',
+    'header_only.csv': 'a,b\n',
+    'list.json': '[{"a": 1}, {"a": null}, {"b": [1, 2]}]',
+    'object.json': '{"r": {"items": [1, 2, 3]}, "z": null}',
+}
+
+READERS = {
+    'csv': utils.read_csv,
+    'json': utils.read_json,
+    'xml': utils.read_xml,
+}
+
+
+def write_file(directory, name, content):
+    file = directory / name
+    if file.suffix == '.gz':
+        with gzip.open(file, mode='wt', encoding='utf8') as fh:
+            fh.write(content)
+    else:
+        file.write_text(content, encoding='utf8')
+    return file
+
+
+def tree_report(file, plunk=False):
+    collector = CollectionStatsCollector(plunk=plunk)
+    collector.add(READERS[file.suffix[1:]](file))
+    return str(collector)
+
+
+def tree_structure(file):
+    collector = CollectionStatsCollector()
+    collector.add(READERS[file.suffix[1:]](file))
+    return collector.format(structure_only=True)
+
+
+def pipeline_report(files, plunk=False, **kwargs):
+    collector = CollectionStatsCollector(plunk=plunk)
+    Pipeline(collector, **kwargs).run(files)
+    return str(collector)
+
+
+@pytest.mark.parametrize('plunk', [False, True])
+@pytest.mark.parametrize('name', list(FILES))
+def test_report_equals_tree_report(tmp_path, name, plunk):
+    file = write_file(tmp_path, name, FILES[name])
+
+    assert pipeline_report([file], plunk=plunk) == tree_report(file, plunk=plunk)
+
+
+def test_compressed_file(tmp_path):
+    file = write_file(tmp_path, 'items.xml', FILES['items.xml'])
+    compressed = write_file(tmp_path, 'items.xml.gz', FILES['items.xml'])
+
+    assert pipeline_report([compressed]) == tree_report(file)
+
+
+def test_files_are_merged(tmp_path):
+    files = [write_file(tmp_path, name, FILES[name]) for name in ('items.xml', 'single_item.xml')]
+
+    tree_collector = CollectionStatsCollector()
+    for file in files:
+        tree_collector.add(utils.read_xml(file))
+
+    assert pipeline_report(files, queue_size=1) == str(tree_collector)
+
+
+def test_header_only_csv(tmp_path):
+    file = write_file(tmp_path, 'header_only.csv', FILES['header_only.csv'])
+
+    assert pipeline_report([file]) == '1 dict size 0 '
+
+
+def test_parse_error_stops_the_pipeline(tmp_path):
+    files = [
+        write_file(tmp_path, 'broken.xml', '<root><item>'),
+        write_file(tmp_path, 'items.xml', FILES['items.xml'] * 1000),
+    ]
+
+    with pytest.raises(Exception, match='no element found'):
+        Pipeline(CollectionStatsCollector(), queue_size=1).run(files)
+
+
+def test_read_error_stops_the_pipeline(tmp_path):
+    files = [
+        write_file(tmp_path, 'items.xml', FILES['items.xml']),
+        tmp_path / 'missing.xml',
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        Pipeline(CollectionStatsCollector()).run(files)
+
+
+STABLE_FILES = {
+    'items.xml': '<root>{}</root>'.format(
+        ''.join(f'<item id="{i}"><v>{i}</v></item>' for i in range(10000)),
+    ),
+    'items.json': json.dumps({'items': [{'id': i, 'v': str(i)} for i in range(10000)]}),
+    'rows.csv': 'id,v\n' + ''.join(f'{i},{i}\n' for i in range(10000)),
+}
+
+
+@pytest.mark.parametrize('name', list(STABLE_FILES))
+def test_stops_once_structure_is_stable(tmp_path, name):
+    file = write_file(tmp_path, name, STABLE_FILES[name])
+    collector = CollectionStatsCollector(stable_after=10)
+    pipeline = Pipeline(collector, queue_size=1)
+
+    pipeline.run([file])
+
+    assert collector.is_stable
+    assert 10 < pipeline.records_count < 10000
+    assert collector.format(structure_only=True) == tree_structure(file)
+
+
+def test_structure_is_stable_before_a_late_field(tmp_path):
+    records = [{'a': i} for i in range(5000)]
+    records[4000]['late'] = 1
+    file = write_file(tmp_path, 'records.json', json.dumps(records))
+    collector = CollectionStatsCollector(stable_after=100)
+    pipeline = Pipeline(collector)
+
+    pipeline.run([file])
+
+    assert pipeline.records_count == 101
+    assert 'late' not in collector.format(structure_only=True)
+
+
+@pytest.mark.parametrize('name, records', [
+    ('items.xml', 5),
+    ('rows.csv', 3),
+    ('header_only.csv', 1),
+    ('list.json', 1),
+    ('empty_root.xml', 1),
+])
+def test_records_count(tmp_path, name, records):
+    file = write_file(tmp_path, name, FILES[name])
+    profiler = Profiler(report=True)
+    pipeline = Pipeline(CollectionStatsCollector(), profiler=profiler)
+
+    pipeline.run([file])
+    profiler.write_report(json_file=tmp_path / 'profile.json')
+
+    assert pipeline.records_count == records
+    assert json.loads((tmp_path / 'profile.json').read_text(encoding='utf8'))['records'] == records
+
+
+def test_samples(tmp_path):
+    file = write_file(tmp_path, 'items.xml', FILES['items.xml'])
+    tree_writer = utils.SamplesWriter(tmp_path / 'tree', is_xml_like=True)
+    pipeline_writer = utils.SamplesWriter(tmp_path / 'pipeline', is_xml_like=True)
+
+    tree_samples = tree_writer._gather_samples(utils.read_xml(file))
+    Pipeline(CollectionStatsCollector(), samples_writer=pipeline_writer).run([file])
+
+    assert {k: sorted(v) for k, v in pipeline_writer._samples.items()} \
+        == {k: sorted(v) for k, v in tree_samples.items()}
+
+
+class TestChunksIO:
+
+    def chunks_io(self, *chunks):
+        pipeline = Pipeline(CollectionStatsCollector())
+        chunks_queue = queue.Queue()
+        for chunk in chunks:
+            chunks_queue.put(chunk)
+        return _ChunksIO(pipeline, chunks_queue), chunks_queue
+
+    def test_read(self):
+        raw, _ = self.chunks_io(b'abc', b'def', None)
+
+        assert raw.read() == b'abcdef'
+        assert raw.read() == b''
+
+    def test_drain_skips_the_rest_of_the_file(self):
+        raw, chunks_queue = self.chunks_io(b'abc', b'def', b'ghi', None, 'next file')
+
+        assert raw.read(4) == b'abc'
+        raw.drain()
+
+        assert raw.read() == b''
+        assert chunks_queue.get_nowait() == 'next file'
+
+    def test_drain_after_end_of_file(self):
+        raw, chunks_queue = self.chunks_io(b'abc', None, 'next file')
+
+        assert raw.read() == b'abc'
+        raw.drain()
+
+        assert chunks_queue.get_nowait() == 'next file'
+
+    def test_kept(self):
+        raw, _ = self.chunks_io(b'abc', b'def', None)
+
+        raw.keep()
+        assert raw.read(2) == b'ab'
+        assert raw.kept() == b'abc'
+        raw.stop_keeping()
+        assert raw.read() == b'cdef'
@@ -0,0 +1,112 @@
+import json
+import time
+
+from collection_stats.profiling import Profiler, peak_rss_mb
+
+
+def test_disabled_profiler_does_nothing(tmp_path, capsys):
+    profiler = Profiler()
+
+    with profiler:
+        with profiler.stage('read'):
+            profiler.add_bytes(10)
+    profiler.write_report(json_file=tmp_path / 'profile.json')
+
+    assert profiler._stages == {}
+    assert not (tmp_path / 'profile.json').exists()
+    assert capsys.readouterr().err == ''
+
+
+def test_stages_are_summed(tmp_path):
+    profiler = Profiler(report=True)
+
+    with profiler:
+        for _ in range(2):
+            with profiler.stage('read'):
+                time.sleep(0.01)
+                profiler.add_bytes(10)
+        with profiler.stage('collect'):
+            profiler.add_records(3)
+    profiler.write_report(json_file=tmp_path / 'profile.json')
+
+    report = json.loads((tmp_path / 'profile.json').read_text(encoding='utf8'))
+    assert report['bytes'] == 20
+    assert report['records'] == 3
+    assert [i['name'] for i in report['stages']] == ['read', 'collect']
+    read = report['stages'][0]
+    assert read['calls'] == 2
+    assert read['seconds'] >= 0.02
+    assert report['seconds'] >= read['seconds']
+    if peak_rss_mb() is not None:
+        assert read['peak_rss_mb'] > 0
+        assert read['peak_rss_growth_mb'] >= 0
+
+
+def test_stage_error_is_raised_and_timed():
+    profiler = Profiler(report=True)
+
+    try:
+        with profiler.stage('parse'):
+            raise ValueError()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('not raised')
+
+    assert profiler._stages['parse']['calls'] == 1
+    assert profiler._active_stages == []
+
+
+def test_report_to_stderr(capsys):
+    profiler = Profiler(report=True)
+
+    with profiler.stage('read'):
+        pass
+    profiler.write_report()
+
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[0].split()[:3] == ['stage', 'wall', 's']
+    assert lines[1].startswith('read ')
+    assert lines[2].startswith('total ')
+
+
+def test_tracemalloc_enables_the_report(capsys):
+    profiler = Profiler(hot_stage='collect', tracemalloc=True)
+
+    with profiler:
+        with profiler.stage('read'):
+            pass
+        with profiler.stage('collect'):
+            data = [str(i) for i in range(10000)]
+    profiler.write_report()
+
+    assert len(data) == 10000
+    assert profiler._tracemalloc_stats['peak_mb'] > 0
+    assert profiler._tracemalloc_stats['top']
+    assert "top allocations of 'collect'" in capsys.readouterr().err
+
+
+def test_cprofile_of_hot_stage(tmp_path):
+    cprofile_file = tmp_path / 'collect.prof'
+    profiler = Profiler(hot_stage='collect', cprofile_file=str(cprofile_file))
+
+    with profiler:
+        for _ in range(2):
+            with profiler.stage('collect'):
+                sum(range(1000))
+
+    assert cprofile_file.stat().st_size
+
+
+def test_progress(capsys, monkeypatch):
+    monkeypatch.setattr(Profiler, 'PROGRESS_INTERVAL', 0.01)
+    profiler = Profiler(progress=True)
+
+    with profiler:
+        with profiler.stage('read'):
+            profiler.add_bytes(2**20)
+            profiler.add_records(5)
+            time.sleep(0.1)
+
+    assert '[read]' in capsys.readouterr().err
+    assert profiler._progress_thread is None
@@ -0,0 +1,83 @@
+import os
+import pickle
+
+import pytest
+
+from collection_stats.collection_stats_collector import collection_stats, utils
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    file = tmp_path / 'data.json'
+    file.write_text('{"a": [1, 2]}', encoding='utf8')
+    return file
+
+
+def test_miss_then_hit(tmp_path, data_file):
+    cache = utils.StatsCache(tmp_path / 'cache')
+    stats = collection_stats({'a': [1, 2]})
+
+    assert cache.get(data_file) is None
+    cache.put(data_file, stats)
+
+    cached = utils.StatsCache(tmp_path / 'cache').get(data_file)
+    assert str(cached) == str(stats)
+
+
+def test_changed_file_or_options_miss(tmp_path, data_file):
+    cache = utils.StatsCache(tmp_path / 'cache', options=dict(plunk=False))
+    cache.put(data_file, collection_stats({'a': [1, 2]}))
+    cache.save_index()
+
+    assert utils.StatsCache(tmp_path / 'cache', options=dict(plunk=True)).get(data_file) is None
+
+    data_file.write_text('{"a": [1, 2, 3]}', encoding='utf8')
+    assert utils.StatsCache(tmp_path / 'cache', options=dict(plunk=False)).get(data_file) is None
+
+
+def test_unchanged_files_are_not_hashed_again(tmp_path, data_file, monkeypatch):
+    cache = utils.StatsCache(tmp_path / 'cache')
+    cache.put(data_file, collection_stats({'a': [1, 2]}))
+    cache.save_index()
+
+    def content_hash(file):
+        raise AssertionError(f"'{file}' hashed again")
+
+    monkeypatch.setattr(utils.StatsCache, '_content_hash', content_hash)
+    assert utils.StatsCache(tmp_path / 'cache').get(data_file) is not None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = utils.StatsCache(tmp_path / 'cache')
+    files = []
+    for name in ('a', 'b'):
+        file = tmp_path / f'{name}.json'
+        file.write_text('[1]', encoding='utf8')
+        cache.put(file, collection_stats([1]))
+        files.append(file)
+    entries = list((tmp_path / 'cache').glob('*' + cache.SUFFIX))
+    for entry in entries:
+        os.utime(entry, (1, 1))
+
+    assert cache.get(files[0]) is not None  # a becomes the most recently used one
+    utils.StatsCache(tmp_path / 'cache', max_size=max(i.stat().st_size for i in entries)).evict()
+
+    assert cache.get(files[0]) is not None
+    assert cache.get(files[1]) is None
+
+
+def test_unfinished_entries_are_evicted(tmp_path, data_file, monkeypatch):
+    cache = utils.StatsCache(tmp_path / 'cache')
+    leftover = tmp_path / 'cache' / ('0' * 64 + cache.SUFFIX + cache.TMP_SUFFIX)
+    leftover.write_bytes(b'interrupted')
+
+    def dump(*args, **kwargs):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(pickle, 'dump', dump)
+    with pytest.raises(KeyboardInterrupt):
+        cache.put(data_file, collection_stats({'a': [1, 2]}))
+    assert sorted(i.name for i in (tmp_path / 'cache').iterdir()) == [leftover.name]
+
+    cache.evict()
+    assert list((tmp_path / 'cache').iterdir()) == []